@@ -3,30 +3,140 @@
 
 import logging
 import sqlite3
-import json
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import re
-from collections import defaultdict
-import statistics
+from collections import defaultdict, Counter, OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
-# Install these packages first: pip install python-telegram-bot textblob matplotlib
+# Install these packages first: pip install "python-telegram-bot[rate-limiter]" vaderSentiment aiosqlite numpy
+import aiosqlite
+import numpy as np
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
-from textblob import TextBlob
-import matplotlib.pyplot as plt
-import io
-import base64
+from telegram.ext import Application, AIORateLimiter, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Incoming messages are written in batches of up to FLUSH_BATCH_SIZE rows,
+# waiting at most FLUSH_INTERVAL seconds for a batch to fill
+FLUSH_BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.05
+
+DB_PATH = 'bot_data.db'
+
+# Read-only connections shared by the analytics commands; under WAL they
+# read concurrently with the writer and with each other
+READER_POOL_SIZE = 8
+
+# Longer texts are rarely repeated, so they bypass the sentiment cache
+SENTIMENT_CACHE_MAX_LEN = 200
+
+# Personality scores are kept for the most recently active users only
+PERSONALITY_CACHE_SIZE = 4096
+
+# Statements used on every message or command. Reusing the exact same SQL
+# text lets sqlite3's statement cache skip re-parsing them.
+SQL_REGISTER_USER = '''
+    INSERT OR IGNORE INTO users (user_id, username, first_name, registration_date)
+    VALUES (?, ?, ?, ?)
+'''
+
+SQL_UPSERT_USER = '''
+    INSERT INTO users (user_id, username, first_name, registration_date, total_messages)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT (user_id) DO UPDATE SET total_messages = total_messages + 1
+'''
+
+SQL_INSERT_MSG = '''
+    INSERT INTO messages (user_id, message_text, timestamp, sentiment_score, word_count, hour, text_lower)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_USER_COUNTS = 'SELECT user_id, total_messages FROM users'
+
+SQL_RECENT_TEXT = '''
+    SELECT text_lower FROM messages
+    WHERE user_id = ?
+    ORDER BY id DESC LIMIT 50
+'''
+
+SQL_RECENT_MSGS = '''
+    SELECT message_text, sentiment_score, timestamp
+    FROM messages
+    WHERE user_id = ?
+    ORDER BY id DESC LIMIT 20
+'''
+
+SQL_WEEKLY_REPORT = '''
+    WITH totals AS (
+        SELECT COUNT(*) AS msg_count, AVG(sentiment_score) AS sentiment, AVG(word_count) AS words
+        FROM messages WHERE user_id = :user_id
+    ), daily AS (
+        SELECT date(timestamp, 'unixepoch', 'localtime') AS day, AVG(sentiment_score) AS sentiment, COUNT(*) AS msg_count
+        FROM messages
+        WHERE user_id = :user_id AND timestamp > :since
+        GROUP BY day
+    ), periods AS (
+        SELECT CASE
+            WHEN hour BETWEEN 6 AND 12 THEN 'Morning'
+            WHEN hour BETWEEN 12 AND 18 THEN 'Afternoon'
+            WHEN hour BETWEEN 18 AND 22 THEN 'Evening'
+            ELSE 'Night'
+        END as time_period, COUNT(*) as msg_count
+        FROM messages
+        WHERE user_id = :user_id
+        GROUP BY time_period
+    )
+    SELECT 'total', NULL, msg_count, sentiment, words FROM totals
+    UNION ALL
+    SELECT 'day', day, msg_count, sentiment, NULL FROM daily
+    UNION ALL
+    SELECT 'period', time_period, msg_count, NULL, NULL FROM periods
+'''
+
+SQL_USER_STATS = '''
+    SELECT
+        COUNT(*) as total_msgs,
+        AVG(sentiment_score) as avg_sentiment,
+        MAX(timestamp) as last_message,
+        MIN(timestamp) as first_message
+    FROM messages WHERE user_id = ?
+'''
+
 class BehaviorAnalysisBot:
     def __init__(self, token):
         self.token = token
-        self.application = Application.builder().token(token).build()
-        self.setup_database()
+        self.conn = None  # the single writer connection
+        self._readers = None
+        self.write_queue = None
+        self.flush_task = None
+        # user_id -> (total_messages, personality scores), least recently used first
+        self._personality_cache = OrderedDict()
+        # user_id -> total_messages, kept in memory so the hot path needs no query
+        self._msg_counter = defaultdict(int)
+        self._vader = SentimentIntensityAnalyzer()
+        # Text analysis runs here so it doesn't block the event loop
+        self._pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+        self.application = (
+            Application.builder()
+            .token(token)
+            # Room for reply bursts, and stay under Telegram's 30 msg/s limit
+            .connection_pool_size(256)
+            .pool_timeout(30)
+            .rate_limiter(AIORateLimiter(overall_max_rate=30, overall_time_period=1, max_retries=3))
+            # Handle updates concurrently, so commands can use the reader pool
+            # in parallel and one slow report doesn't stall everyone's messages
+            .concurrent_updates(256)
+            .post_init(self.on_startup)
+            .post_shutdown(self.on_shutdown)
+            .build()
+        )
         self.setup_handlers()
         
         # Personality keywords for analysis
@@ -40,14 +150,63 @@ class BehaviorAnalysisBot:
         
         # Stress indicators
         self.stress_keywords = ['deadline', 'pressure', 'overwhelmed', 'can\'t', 'too much', 'tired', 'exhausted']
-
-    def setup_database(self):
+        
+        # One compiled pattern covering every trait and stress keyword, so a
+        # text is scanned once; matches map back to their category
+        self._keyword_category = {keyword: 'stress' for keyword in self.stress_keywords}
+        for trait, keywords in self.personality_indicators.items():
+            self._keyword_category.update(dict.fromkeys(keywords, trait))
+        alternation = '|'.join(map(re.escape, sorted(self._keyword_category, key=len, reverse=True)))
+        self._keyword_re = re.compile(r'\b(?:' + alternation + r')\b')
+        
+        # Personality bars for every possible score // 10
+        self._bars = ["█" * i + "░" * (10 - i) for i in range(11)]
+
+    async def on_startup(self, application):
+        """Open the database and start the message writer on the bot's event loop"""
+        await self.setup_database()
+        async with self.conn.execute(SQL_USER_COUNTS) as cursor:
+            async for user_id, total_messages in cursor:
+                self._msg_counter[user_id] = total_messages
+        self._readers = asyncio.Queue()
+        for _ in range(READER_POOL_SIZE):
+            self._readers.put_nowait(await self.connect_reader())
+        self.write_queue = asyncio.Queue()
+        self.flush_task = asyncio.create_task(self.flush_messages())
+        self.flush_task.add_done_callback(self.on_flush_done)
+
+    async def on_shutdown(self, application):
+        """Write any queued messages and close the database"""
+        if self.flush_task is not None:
+            await self.wait_for_writes()
+            self.flush_task.cancel()
+            self.flush_task = None
+        if self._readers is not None:
+            while not self._readers.empty():
+                await self._readers.get_nowait().close()
+            self._readers = None
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+        self._pool.shutdown(wait=False)
+
+    async def setup_database(self):
         """Initialize SQLite database"""
-        self.conn = sqlite3.connect('bot_data.db', check_same_thread=False)
-        cursor = self.conn.cursor()
+        # Autocommit mode: transactions are opened explicitly where needed
+        self.conn = await aiosqlite.connect(DB_PATH, cached_statements=256, isolation_level=None)
+
+        # WAL lets readers and the writer work concurrently; NORMAL sync
+        # skips the per-commit fsync, which is safe in WAL mode
+        await self.conn.execute('PRAGMA journal_mode=WAL')
+        await self.conn.execute('PRAGMA synchronous=NORMAL')
+        await self.conn.execute('PRAGMA temp_store=MEMORY')
+        await self.conn.execute('PRAGMA mmap_size=268435456')
+        await self.conn.execute('PRAGMA cache_size=-20000')
+
+        await self.conn.execute('BEGIN')
         
         # Users table
-        cursor.execute('''
+        await self.conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
                 username TEXT,
@@ -58,20 +217,43 @@ class BehaviorAnalysisBot:
         ''')
         
         # Messages table
-        cursor.execute('''
+        await self.conn.execute('''
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER,
                 message_text TEXT,
-                timestamp TIMESTAMP,
+                timestamp INTEGER,
                 sentiment_score REAL,
                 word_count INTEGER,
+                hour INTEGER,
+                text_lower TEXT,
                 FOREIGN KEY (user_id) REFERENCES users (user_id)
             )
         ''')
         
+        # Older databases predate the precomputed hour column
+        if await self.add_missing_column('messages', 'hour', 'INTEGER'):
+            await self.conn.execute("UPDATE messages SET hour = CAST(strftime('%H', timestamp) AS INTEGER)")
+        # ... and the lowercased copy used for keyword analysis (SQLite's
+        # lower() only folds ASCII, which covers every keyword we match)
+        if await self.add_missing_column('messages', 'text_lower', 'TEXT'):
+            await self.conn.execute('UPDATE messages SET text_lower = lower(message_text)')
+        
+        # Schema version 1: timestamps are Unix epoch seconds instead of local
+        # ISO strings, and the DATE(timestamp) index no longer applies
+        async with self.conn.execute('PRAGMA user_version') as cursor:
+            (schema_version,) = await cursor.fetchone()
+        if schema_version < 1:
+            # Drop the old index first so the UPDATE doesn't maintain it row by row
+            await self.conn.execute('DROP INDEX IF EXISTS idx_msg_user_date')
+            await self.conn.execute('''
+                UPDATE messages SET timestamp = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+                WHERE typeof(timestamp) = 'text'
+            ''')
+            await self.conn.execute('PRAGMA user_version = 1')
+        
         # Daily analytics table
-        cursor.execute('''
+        await self.conn.execute('''
             CREATE TABLE IF NOT EXISTS daily_analytics (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER,
@@ -84,7 +266,40 @@ class BehaviorAnalysisBot:
             )
         ''')
         
-        self.conn.commit()
+        # Indexes for the per-user analytics queries
+        await self.conn.execute('CREATE INDEX IF NOT EXISTS idx_msg_user_ts ON messages(user_id, timestamp DESC)')
+        await self.conn.execute('CREATE INDEX IF NOT EXISTS idx_msg_user_hour ON messages(user_id, hour)')
+        # Ids increase with insertion time, so "latest N messages" walks this backwards
+        await self.conn.execute('CREATE INDEX IF NOT EXISTS idx_msg_user_id ON messages(user_id, id)')
+        
+        await self.conn.execute('COMMIT')
+
+    async def connect_reader(self):
+        """Open a read-only connection for the reader pool"""
+        conn = await aiosqlite.connect(f'file:{DB_PATH}?mode=ro', uri=True, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        await conn.execute('PRAGMA temp_store=MEMORY')
+        await conn.execute('PRAGMA mmap_size=268435456')
+        await conn.execute('PRAGMA cache_size=-20000')
+        return conn
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection from the pool"""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def add_missing_column(self, table, column, definition):
+        """Add a column to an existing table, returns True if it was missing"""
+        async with self.conn.execute(f'PRAGMA table_info({table})') as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if column in columns:
+            return False
+        await self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
 
     def setup_handlers(self):
         """Setup all bot command and message handlers"""
@@ -105,20 +320,93 @@ class BehaviorAnalysisBot:
         self.application.add_handler(CallbackQueryHandler(self.button_callback))
 
     def register_user(self, user_id, username, first_name):
-        """Register new user in database"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, username, first_name, registration_date)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, username, first_name, datetime.now()))
-        self.conn.commit()
+        """Queue registration of a new user for the batched writer"""
+        self.write_queue.put_nowait((SQL_REGISTER_USER, (user_id, username, first_name, datetime.now())))
+
+    async def flush_messages(self):
+        """Background task writing queued (sql, params) items in batches"""
+        # After startup this is the only code running statements on the writer
+        # connection, so its transactions never interleave with other writes
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = [await self.write_queue.get()]
+            deadline = loop.time() + FLUSH_INTERVAL
+            while len(rows) < FLUSH_BATCH_SIZE:
+                if not self.write_queue.empty():
+                    rows.append(self.write_queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(self.write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Group rows by statement (order within each statement is kept);
+            # barrier futures from wait_for_writes() carry no statement
+            batches = defaultdict(list)
+            barriers = []
+            for sql, params in rows:
+                if sql is None:
+                    barriers.append(params)
+                else:
+                    batches[sql].append(params)
+            
+            try:
+                # Write the whole batch in one transaction
+                if batches:
+                    await self.conn.execute('BEGIN IMMEDIATE')
+                    for sql, params in batches.items():
+                        await self.conn.executemany(sql, params)
+                    await self.conn.execute('COMMIT')
+            except Exception:
+                logger.exception("Failed to write %d queued messages", len(rows))
+                try:
+                    if self.conn.in_transaction:
+                        await self.conn.execute('ROLLBACK')
+                except Exception:
+                    logger.exception("Failed to roll back message batch")
+            finally:
+                for barrier in barriers:
+                    if not barrier.done():
+                        barrier.set_result(None)
+
+    def on_flush_done(self, task):
+        """Log the message writer stopping for any reason other than shutdown"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Message writer stopped, %d queued writes will not be saved",
+                         self.write_queue.qsize(), exc_info=task.exception())
+
+    async def wait_for_writes(self):
+        """Wait until everything queued so far is committed (no-op if the writer has stopped)"""
+        if self.flush_task is None or self.flush_task.done():
+            return
+        # The queue is FIFO, so once the flusher reaches this barrier every
+        # earlier write has been committed; later writes don't delay us
+        barrier = asyncio.get_running_loop().create_future()
+        self.write_queue.put_nowait((None, barrier))
+        # Wait on the task too, so a writer dying mid-wait can't hang us
+        await asyncio.wait({barrier, self.flush_task}, return_when=asyncio.FIRST_COMPLETED)
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _sentiment_scores(analyzer, text):
+        """VADER (polarity, subjectivity) for a text, cached for repeated phrases"""
+        scores = analyzer.polarity_scores(text)
+        return scores['compound'], 1.0 - scores['neu']
 
     def analyze_sentiment(self, text):
-        """Analyze sentiment using TextBlob"""
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity  # -1 to 1
-        subjectivity = blob.sentiment.subjectivity  # 0 to 1
-        
+        """Analyze sentiment using VADER"""
+        if len(text) > SENTIMENT_CACHE_MAX_LEN:
+            scores = self._sentiment_scores.__wrapped__(self._vader, text)
+        else:
+            scores = self._sentiment_scores(self._vader, text)
+        polarity, subjectivity = scores  # -1 to 1, 0 to 1
+        return self.describe_sentiment(polarity, subjectivity)
+
+    def describe_sentiment(self, polarity, subjectivity=None):
+        """Build the mood summary for a polarity score"""
         # Convert to more intuitive scale
         if polarity > 0.1:
             mood = "Positive 😊"
@@ -134,30 +422,57 @@ class BehaviorAnalysisBot:
             'confidence': abs(polarity)
         }
 
-    def analyze_personality(self, user_id):
+    async def analyze_personality(self, user_id):
         """Analyze personality traits from user's message history"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT message_text FROM messages 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC LIMIT 50
-        ''', (user_id,))
+        # Scores only change when the user sends a new message
+        version = self._msg_counter.get(user_id, 0)
         
-        messages = [row[0].lower() for row in cursor.fetchall()]
-        all_text = ' '.join(messages)
+        cached = self._personality_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            self._personality_cache.move_to_end(user_id)
+            return cached[1]
+        
+        # Make sure the user's queued messages are written before reading them
+        await self.wait_for_writes()
+        
+        async with self.reader() as conn, conn.execute(SQL_RECENT_TEXT, (user_id,)) as cursor:
+            all_text = ' '.join([row['text_lower'] async for row in cursor])
+        
+        personality_scores = await self.run_in_pool(self.score_personality, all_text)
+        
+        self._personality_cache[user_id] = (version, personality_scores)
+        self._personality_cache.move_to_end(user_id)
+        if len(self._personality_cache) > PERSONALITY_CACHE_SIZE:
+            self._personality_cache.popitem(last=False)
+        return personality_scores
+
+    def score_personality(self, all_text):
+        """Score each personality trait (0-100) from lowercased text"""
+        trait_counts = dict.fromkeys(self.personality_indicators, 0)
+        for keyword, count in self.scan_keywords(all_text).items():
+            category = self._keyword_category[keyword]
+            if category in trait_counts:
+                trait_counts[category] += count
         
         personality_scores = {}
-        for trait, keywords in self.personality_indicators.items():
-            score = sum(all_text.count(keyword) for keyword in keywords)
+        for trait, score in trait_counts.items():
             # Normalize score (0-100 scale)
             personality_scores[trait] = min(score * 5, 100)
         
         return personality_scores
 
-    def detect_stress_level(self, text):
-        """Detect stress level from text"""
-        text_lower = text.lower()
-        stress_count = sum(1 for keyword in self.stress_keywords if keyword in text_lower)
+    async def run_in_pool(self, func, *args):
+        """Run CPU-bound analysis in the worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    def scan_keywords(self, text_lower):
+        """Count occurrences of each known keyword in lowercased text"""
+        return Counter(self._keyword_re.findall(text_lower))
+
+    def detect_stress_level(self, text_lower):
+        """Detect stress level from lowercased text"""
+        hits = self.scan_keywords(text_lower)
+        stress_count = sum(1 for keyword in hits if self._keyword_category[keyword] == 'stress')
         
         # Calculate stress level (0-10 scale)
         stress_level = min(stress_count * 2, 10)
@@ -208,34 +523,25 @@ Available commands:
         """Analyze every message for behavioral patterns"""
         user = update.effective_user
         message_text = update.message.text
-        
-        # Register user if not exists
-        self.register_user(user.id, user.username, user.first_name)
+        text_lower = message_text.lower()
         
         # Analyze sentiment
-        sentiment = self.analyze_sentiment(message_text)
+        sentiment = await self.run_in_pool(self.analyze_sentiment, message_text)
         
-        # Store message in database
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO messages (user_id, message_text, timestamp, sentiment_score, word_count)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user.id, message_text, datetime.now(), sentiment['polarity'], len(message_text.split())))
+        # Queue user registration and message for the batched writer
+        now = datetime.now()
+        self.write_queue.put_nowait((SQL_UPSERT_USER, (user.id, user.username, user.first_name, now)))
+        self.write_queue.put_nowait((
+            SQL_INSERT_MSG,
+            (user.id, message_text, int(now.timestamp()), sentiment['polarity'], len(message_text.split()), now.hour, text_lower),
+        ))
         
-        # Update user message count
-        cursor.execute('''
-            UPDATE users SET total_messages = total_messages + 1 
-            WHERE user_id = ?
-        ''', (user.id,))
-        
-        self.conn.commit()
+        self._msg_counter[user.id] += 1
+        total_msgs = self._msg_counter[user.id]
         
         # Provide feedback every 10 messages
-        cursor.execute('SELECT total_messages FROM users WHERE user_id = ?', (user.id,))
-        total_msgs = cursor.fetchone()[0]
-        
         if total_msgs % 10 == 0:
-            stress = self.detect_stress_level(message_text)
+            stress = await self.run_in_pool(self.detect_stress_level, text_lower)
             feedback = f"""
 📊 Quick Analysis (Message #{total_msgs}):
 • Mood: {sentiment['mood']}
@@ -250,30 +556,34 @@ Type /mood for detailed analysis!
         """Detailed mood analysis"""
         user_id = update.effective_user.id
         
-        # Get recent messages
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT message_text, sentiment_score, timestamp 
-            FROM messages 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC LIMIT 20
-        ''', (user_id,))
+        # Make sure the user's queued messages are written before reading them
+        await self.wait_for_writes()
         
-        recent_data = cursor.fetchall()
+        # Get recent messages
+        async with self.reader() as conn, conn.execute(SQL_RECENT_MSGS, (user_id,)) as cursor:
+            recent_data = await cursor.fetchall()
         
         if not recent_data:
             await update.message.reply_text("I need more messages to analyze your mood. Keep chatting with me! 😊")
             return
         
         # Calculate mood statistics
-        sentiments = [row[1] for row in recent_data]
-        avg_sentiment = statistics.mean(sentiments)
-        mood_trend = "improving" if len(sentiments) > 1 and sentiments[0] > sentiments[-1] else "declining"
+        # Rows are newest first; fit the trend line in chronological order
+        sentiments = np.fromiter(
+            (row['sentiment_score'] for row in reversed(recent_data)), dtype=np.float64, count=len(recent_data)
+        )
+        avg_sentiment = float(sentiments.mean())
+        slope = np.polyfit(np.arange(len(sentiments)), sentiments, 1)[0] if len(sentiments) >= 2 else 0.0
+        # A flat series fits to a tiny nonzero slope, so treat those as stable
+        if abs(slope) < 1e-3:
+            mood_trend = "stable"
+        else:
+            mood_trend = "improving" if slope > 0 else "declining"
         
-        # Recent message analysis
-        latest_text = recent_data[0][0]
-        current_sentiment = self.analyze_sentiment(latest_text)
-        stress = self.detect_stress_level(latest_text)
+        # Recent message analysis (its score was stored when it arrived)
+        latest_text, latest_score = recent_data[0]['message_text'], recent_data[0]['sentiment_score']
+        current_sentiment = self.describe_sentiment(latest_score)
+        stress = await self.run_in_pool(self.detect_stress_level, latest_text.lower())
         
         mood_report = f"""
 🎯 **DETAILED MOOD ANALYSIS**
@@ -310,7 +620,7 @@ Type /mood for detailed analysis!
     async def personality_analysis(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Analyze personality traits"""
         user_id = update.effective_user.id
-        personality_scores = self.analyze_personality(user_id)
+        personality_scores = await self.analyze_personality(user_id)
         
         if not any(personality_scores.values()):
             await update.message.reply_text("I need more messages to analyze your personality. Keep chatting! 🧠")
@@ -328,7 +638,7 @@ Type /mood for detailed analysis!
         }
         
         for trait, score in personality_scores.items():
-            bar = "█" * (score // 10) + "░" * (10 - score // 10)
+            bar = self._bars[score // 10]
             report += f"**{trait_descriptions[trait]}:**\n"
             report += f"{bar} {score}%\n\n"
         
@@ -354,31 +664,31 @@ Type /mood for detailed analysis!
         """Generate comprehensive behavior report"""
         user_id = update.effective_user.id
         
-        # Get user data
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*), AVG(sentiment_score), AVG(word_count)
-            FROM messages WHERE user_id = ?
-        ''', (user_id,))
-        
-        stats = cursor.fetchone()
+        # Make sure the user's queued messages are written before reading them
+        await self.wait_for_writes()
+        
+        # Totals, weekly summary and activity periods in a single round trip
+        week_ago = int((datetime.now() - timedelta(days=7)).timestamp())
+        async with self.reader() as conn, conn.execute(SQL_WEEKLY_REPORT, {'user_id': user_id, 'since': week_ago}) as cursor:
+            rows = await cursor.fetchall()
+        
+        stats = None
+        daily_data = []
+        time_patterns = []
+        for kind, label, count, sentiment, words in rows:
+            if kind == 'total':
+                stats = (count, sentiment, words)
+            elif kind == 'day':
+                daily_data.append((label, sentiment, count))
+            else:
+                time_patterns.append((label, count))
+        daily_data.sort()
+        time_patterns.sort(key=lambda pattern: pattern[1], reverse=True)
         
         if stats[0] < 5:
             await update.message.reply_text("I need at least 5 messages to generate a comprehensive report. Keep chatting! 📊")
             return
         
-        # Get recent 7 days data
-        week_ago = datetime.now() - timedelta(days=7)
-        cursor.execute('''
-            SELECT DATE(timestamp), AVG(sentiment_score), COUNT(*)
-            FROM messages 
-            WHERE user_id = ? AND timestamp > ?
-            GROUP BY DATE(timestamp)
-            ORDER BY DATE(timestamp)
-        ''', (user_id, week_ago))
-        
-        daily_data = cursor.fetchall()
-        
         # Generate comprehensive report
         total_messages, avg_sentiment, avg_words = stats
         
@@ -399,29 +709,13 @@ Type /mood for detailed analysis!
                 report += f"\n• {date}: {count} messages, Mood {mood_emoji} ({sentiment:.2f})"
         
         # Personality analysis
-        personality = self.analyze_personality(user_id)
+        personality = await self.analyze_personality(user_id)
         report += "\n\n🧠 **Personality Insights:**\n"
         
         for trait, score in personality.items():
             if score > 50:
                 report += f"• {trait.title()}: {score}% (Above Average)\n"
         
-        # Behavioral patterns
-        cursor.execute('''
-            SELECT CASE 
-                WHEN CAST(strftime('%H', timestamp) AS INTEGER) BETWEEN 6 AND 12 THEN 'Morning'
-                WHEN CAST(strftime('%H', timestamp) AS INTEGER) BETWEEN 12 AND 18 THEN 'Afternoon'  
-                WHEN CAST(strftime('%H', timestamp) AS INTEGER) BETWEEN 18 AND 22 THEN 'Evening'
-                ELSE 'Night'
-            END as time_period, COUNT(*) as msg_count
-            FROM messages 
-            WHERE user_id = ?
-            GROUP BY time_period
-            ORDER BY msg_count DESC
-        ''', (user_id,))
-        
-        time_patterns = cursor.fetchall()
-        
         if time_patterns:
             most_active = time_patterns[0][0]
             report += f"\n⏰ **Activity Patterns:**\n"
@@ -450,17 +744,11 @@ Type /mood for detailed analysis!
         """Show user statistics"""
         user_id = update.effective_user.id
         
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_msgs,
-                AVG(sentiment_score) as avg_sentiment,
-                MAX(timestamp) as last_message,
-                MIN(timestamp) as first_message
-            FROM messages WHERE user_id = ?
-        ''', (user_id,))
+        # Make sure the user's queued messages are written before reading them
+        await self.wait_for_writes()
         
-        stats = cursor.fetchone()
+        async with self.reader() as conn, conn.execute(SQL_USER_STATS, (user_id,)) as cursor:
+            stats = await cursor.fetchone()
         
         if stats[0] == 0:
             await update.message.reply_text("No data available yet. Start chatting to see your stats! 📊")
@@ -468,7 +756,7 @@ Type /mood for detailed analysis!
         
         # Calculate days active
         if stats[3]:  # if first_message exists
-            first_msg = datetime.fromisoformat(stats[3])
+            first_msg = datetime.fromtimestamp(stats[3])
             days_active = (datetime.now() - first_msg).days + 1
         else:
             days_active = 1
@@ -486,7 +774,7 @@ Type /mood for detailed analysis!
 • Mood Category: {"Positive" if stats[1] > 0.1 else "Negative" if stats[1] < -0.1 else "Neutral"}
 
 ⏰ **Activity:**
-• Last Message: {stats[2][:10] if stats[2] else 'N/A'}
+• Last Message: {datetime.fromtimestamp(stats[2]):%Y-%m-%d}
 • Analysis Accuracy: {min(stats[0] * 5, 95)}%
 
 💫 Keep chatting for more accurate insights!